@@ -59,18 +59,17 @@ FEEDS = {
     },
 }
 
-# Flatten for easy iteration
+# Flatten for easy iteration (computed once at import - FEEDS is constant)
+_ALL_FEEDS = tuple(
+    {'name': name, 'category': category, **config}
+    for category, feeds in FEEDS.items()
+    for name, config in feeds.items()
+)
+
+
 def get_all_feeds():
-    """Return flat list of all feed configs."""
-    all_feeds = []
-    for category, feeds in FEEDS.items():
-        for name, config in feeds.items():
-            all_feeds.append({
-                'name': name,
-                'category': category,
-                **config
-            })
-    return all_feeds
+    """Return flat tuple of all feed configs."""
+    return _ALL_FEEDS
 
 # Summary stats
 TOTAL_FEEDS = sum(len(feeds) for feeds in FEEDS.values())
@@ -11,9 +11,11 @@ Output: data/deduplicated/YYYYMMDD_HHMMSS.json
 Usage:
     python stage2_5_deduplicate.py data/aggregated/20251026_135254.json
     python stage2_5_deduplicate.py  # Uses latest aggregated file
+    python stage2_5_deduplicate.py --pretty  # Indented JSON output (debugging)
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -38,25 +40,23 @@ def load_aggregated_file(file_path: Path) -> list[dict]:
 
 def get_recent_files(days: int = LOOKBACK_DAYS) -> list[Path]:
     """Get all aggregated files from the last N days"""
-    cutoff_date = datetime.now() - timedelta(days=days)
+    # File dates are midnight, so a file from the cutoff day itself is already
+    # older than the cutoff - compare YYYYMMDD strings instead of parsing each
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
     recent_files = []
 
-    for file_path in sorted(AGGREGATED_DIR.glob('*.json'), reverse=True):
-        # Extract date from filename (YYYYMMDD_HHMMSS.json)
-        try:
-            date_str = file_path.stem.split('_')[0]
-            file_date = datetime.strptime(date_str, '%Y%m%d')
-
-            if file_date >= cutoff_date:
-                recent_files.append(file_path)
-            else:
-                # Files are sorted by date, so we can stop here
-                break
-        except (ValueError, IndexError):
+    with os.scandir(AGGREGATED_DIR) as entries:
+        for entry in entries:
+            # Extract date from filename (YYYYMMDD_HHMMSS.json)
+            if not entry.name.endswith('.json'):
+                continue
+            date_str = entry.name[:-len('.json')].split('_')[0]
             # Skip files with unexpected naming
-            continue
+            if len(date_str) == 8 and date_str.isdigit() and date_str > cutoff:
+                recent_files.append(Path(entry.path))
 
-    return recent_files
+    # Only the few files in the window get sorted (newest first)
+    return sorted(recent_files, reverse=True)
 
 
 def extract_urls_from_history(files: list[Path]) -> set[str]:
@@ -98,8 +98,8 @@ def deduplicate_articles(articles: list[dict], historical_urls: set[str]) -> tup
     return new_articles, duplicate_articles
 
 
-def save_deduplicated(articles: list[dict], output_path: Path, stats: dict):
-    """Save deduplicated articles to JSON file"""
+def save_deduplicated(articles: list[dict], output_path: Path, stats: dict, pretty: bool = False):
+    """Save deduplicated articles to JSON file (compact unless pretty)"""
     output_data = {
         'metadata': {
             'timestamp': datetime.now().isoformat(),
@@ -115,7 +115,7 @@ def save_deduplicated(articles: list[dict], output_path: Path, stats: dict):
     }
 
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+        json.dump(output_data, f, ensure_ascii=False, indent=2 if pretty else None)
 
 
 def main():
@@ -123,16 +123,18 @@ def main():
     print("STAGE 2.5: DEDUPLICATION")
     print("="*80 + "\n")
 
+    args = [arg for arg in sys.argv[1:] if arg != '--pretty']
+    pretty = len(args) < len(sys.argv) - 1
+
     # Determine input file
-    if len(sys.argv) > 1:
-        input_path = Path(sys.argv[1])
+    if args:
+        input_path = Path(args[0])
     else:
         # Use latest aggregated file
-        aggregated_files = sorted(AGGREGATED_DIR.glob('*.json'), reverse=True)
-        if not aggregated_files:
+        input_path = max(AGGREGATED_DIR.glob('*.json'), default=None, key=lambda p: p.name)
+        if input_path is None:
             print("❌ Keine aggregierten Dateien gefunden in data/aggregated/")
             sys.exit(1)
-        input_path = aggregated_files[0]
 
     if not input_path.exists():
         print(f"❌ Datei nicht gefunden: {input_path}")
@@ -199,7 +201,7 @@ def main():
     output_path = DEDUPLICATED_DIR / f'{timestamp}.json'
 
     print(f"\n💾 Speichere deduplizierte Artikel...")
-    save_deduplicated(new_articles, output_path, stats)
+    save_deduplicated(new_articles, output_path, stats, pretty)
     print(f"   ✅ Gespeichert: {output_path.name}")
 
     print("\n" + "="*80)
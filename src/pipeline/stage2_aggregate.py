@@ -3,12 +3,15 @@
 Stage 2: Aggregate - Load last 7 daily dumps and deduplicate.
 Saves to data/aggregated/ for Stage 3 filtering.
 Can be run ad-hoc anytime - always processes last 7 days.
+Output is compact JSON; pass --pretty for indented output when debugging.
 """
 
+import gzip
 import json
+import sys
 from pathlib import Path
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import Counter
 
 
 def load_last_7_days():
@@ -25,16 +28,19 @@ def load_last_7_days():
     # Get last 7 days
     for i in range(7):
         date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-        filepath = daily_dir / f"{date}.json"
+        # Stage 1 writes .json.gz; older snapshots are plain .json
+        filepath = daily_dir / f"{date}.json.gz"
+        if not filepath.exists():
+            filepath = daily_dir / f"{date}.json"
 
         if filepath.exists():
-            print(f"  {date}  ", end='', flush=True)
-            with open(filepath, 'r') as f:
+            opener = gzip.open if filepath.suffix == '.gz' else open
+            with opener(filepath, 'rt', encoding='utf-8') as f:
                 data = json.load(f)
                 count = len(data['articles'])
                 all_articles.extend(data['articles'])
                 loaded_dates.append(date)
-                print(f"✅ {count:3d} articles")
+                print(f"  {date}  ✅ {count:3d} articles")
         else:
             print(f"  {date}   ⚠️  Not found (skipping)")
 
@@ -51,12 +57,12 @@ def deduplicate_articles(articles):
     print(f"DEDUPLICATION")
     print(f"{'='*80}\n")
 
-    seen_urls = {}
-    seen_title_source = {}
+    # URLs (str) and title+source keys (tuple) never collide, so one set holds both
+    seen = set()
     duplicates = 0
 
-    # Process in reverse chronological order (most recent first)
-    # Assumes articles are already roughly sorted by date
+    # Process in reverse chronological order (most recent first). The order is
+    # kept in the output: Stage 4 numbers articles in this order in its prompt.
     sorted_articles = sorted(
         articles,
         key=lambda x: x.get('published') or '1900-01-01',
@@ -70,21 +76,16 @@ def deduplicate_articles(articles):
         title = article.get('title', '')
         source = article.get('source', '')
 
-        # Primary dedup: by URL
-        if url and url in seen_urls:
-            duplicates += 1
-            continue
-
-        # Fallback dedup: by title + source
+        # Primary dedup: by URL, fallback: by title + source
         key = (title, source)
-        if key in seen_title_source:
+        if (url and url in seen) or key in seen:
             duplicates += 1
             continue
 
         # New article
         if url:
-            seen_urls[url] = True
-        seen_title_source[key] = True
+            seen.add(url)
+        seen.add(key)
         unique_articles.append(article)
 
     print(f"Input articles:      {len(articles)}")
@@ -95,26 +96,12 @@ def deduplicate_articles(articles):
     return unique_articles
 
 
-def save_aggregated(articles, loaded_dates):
-    """Save aggregated articles to data/aggregated/."""
+def save_aggregated(articles, loaded_dates, pretty=False):
+    """Save aggregated articles to data/aggregated/ (indented only if pretty)."""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     week = datetime.now().strftime('%Y-W%U')  # For metadata only
     filename = f"data/aggregated/{timestamp}.json"
 
-    # Calculate stats
-    stats = {
-        'by_category': defaultdict(int),
-        'by_source': defaultdict(int),
-        'by_day': defaultdict(int),
-    }
-
-    for article in articles:
-        stats['by_category'][article['category']] += 1
-        stats['by_source'][article['source']] += 1
-        if article.get('published'):
-            day = article['published'][:10]
-            stats['by_day'][day] += 1
-
     dump_data = {
         'week': week,
         'timestamp': datetime.now().isoformat(),
@@ -126,27 +113,24 @@ def save_aggregated(articles, loaded_dates):
         'total_articles': len(articles),
         'articles': articles,
         'stats': {
-            'by_category': dict(stats['by_category']),
-            'by_source': dict(stats['by_source']),
-            'by_day': dict(stats['by_day']),
+            'by_category': dict(Counter(a['category'] for a in articles)),
+            'by_source': dict(Counter(a['source'] for a in articles)),
+            'by_day': dict(Counter(a['published'][:10] for a in articles if a.get('published'))),
         }
     }
 
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(dump_data, f, indent=2, ensure_ascii=False)
+        json.dump(dump_data, f, indent=2 if pretty else None, ensure_ascii=False)
 
-    return filename
+    return filename, dump_data
 
 
-def print_stats(filename):
-    """Print statistics about the weekly aggregate."""
+def print_stats(data):
+    """Print statistics about the weekly aggregate (from the in-memory dump)."""
     print(f"\n{'='*80}")
     print(f"STATISTICS")
     print(f"{'='*80}\n")
 
-    with open(filename, 'r') as f:
-        data = json.load(f)
-
     print(f"Week: {data['week']}")
     print(f"Date range: {data['date_range']['start']} to {data['date_range']['end']}")
     print(f"Days included: {data['days_included']}/7")
@@ -192,11 +176,12 @@ def main():
     print(f"SAVING AGGREGATED DATA")
     print(f"{'='*80}\n")
 
-    filename = save_aggregated(unique_articles, loaded_dates)
+    pretty = '--pretty' in sys.argv[1:]
+    filename, dump_data = save_aggregated(unique_articles, loaded_dates, pretty)
     print(f"✅ Saved {len(unique_articles)} unique articles to: {filename}\n")
 
     # Print stats
-    print_stats(filename)
+    print_stats(dump_data)
 
     print(f"\n{'='*80}")
     print(f"DONE - STAGE 2")
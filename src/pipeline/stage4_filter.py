@@ -2,47 +2,51 @@
 """
 Stage 4: Claude Filter - Load pre-filtered articles and filter with Claude.
 Allows quick prompt engineering iteration without re-embedding.
+
+Usage:
+    python stage4_filter.py data/filtered_keywords/YYYYMMDD_HHMMSS.json 4
+    python stage4_filter.py data/filtered_keywords/YYYYMMDD_HHMMSS.json 4 --no-cache
 """
 
+import hashlib
+import importlib.metadata
 import json
 import asyncio
+import os
+import re
 import sys
 from pathlib import Path
 from datetime import datetime
 from claude_agent_sdk import ClaudeSDKClient, AssistantMessage, TextBlock
 
+# Opening fence line with an optional language tag (```markdown, ```md, ```)
+# or closing fence. The tag must end the line: text glued to the fence only
+# loses the backticks, never its first characters
+_CODE_FENCE_RE = re.compile(r'\A```(?:[\w-]*[ \t]*\r?\n)?|\n?```\Z')
+# Blank line(s) between two bullet lines
+_BULLET_SQUASH_RE = re.compile(r'(^- .+)(\n\n+)(^- )', re.MULTILINE)
 
-async def filter_with_claude(articles, prompt_version="v1"):
-    """
-    Filter articles using Claude Agent SDK.
-    Uses same auth as `claude` CLI binary.
-    """
-    print(f"\n{'='*80}")
-    print(f"STAGE 4: FILTERING WITH CLAUDE")
-    print(f"{'='*80}\n")
-    print(f"Prompt version: {prompt_version}")
-    print(f"Articles to filter: {len(articles)}\n")
+# Print at most one progress dot per interval while the response streams
+PROGRESS_DOT_INTERVAL = 0.25  # seconds
 
-    # Prepare articles for Claude
-    print(f"⏳ Bereite Artikel für Claude vor...")
-    articles_text = []
-    for i, article in enumerate(articles, 1):
-        pub_str = article.get('published', 'Unbekanntes Datum')
-        if pub_str and 'T' in pub_str:
-            pub_str = pub_str.split('T')[0]  # Just date part
+# Finished digests keyed by a hash of the full prompt: re-running the same input
+# with the same prompt (e.g. after a failed Discord post) skips the Claude call
+DIGEST_CACHE_DIR = Path('data/cache/claude')
 
-        articles_text.append(
-            f"[{i}] {article['title']}\n"
-            f"Quelle: {article['source']} | {pub_str}\n"
-            f"Inhalt: {article['content'][:500]}...\n"
-            f"Link: {article['link']}\n"
-        )
+# Part of the cache key: ClaudeSDKClient() runs with the SDK's default model and
+# options, so an SDK upgrade invalidates cached digests. Change the suffix when
+# passing options (model, system prompt, ...) to ClaudeSDKClient.
+try:
+    _SDK_VERSION = importlib.metadata.version('claude-agent-sdk')
+except importlib.metadata.PackageNotFoundError:
+    _SDK_VERSION = 'unknown'
+CLIENT_CACHE_ID = f"claude-agent-sdk/{_SDK_VERSION}:default-options"
 
-    articles_input = "\n".join(articles_text)
 
-    # Claude TLDR digest prompt
-    # TODO: Make this configurable/versioned
-    prompt = f"""Du erstellst einen täglichen News-Digest für einen technisch interessierten Leser in Deutschland.
+# Claude TLDR digest prompt - {articles_input} is filled in per run
+# (literal braces in the template must be doubled for str.format)
+# TODO: Make this configurable/versioned
+PROMPT_TEMPLATE = """Du erstellst einen täglichen News-Digest für einen technisch interessierten Leser in Deutschland.
 
 Fasse nur RELEVANTE Artikel zusammen und priorisiere sie in 3 Tiers:
 
@@ -223,6 +227,60 @@ Artikel zum Zusammenfassen:
 
 Antworte NUR mit Markdown wie oben beschrieben."""
 
+
+def strip_code_fence(text: str) -> str:
+    """Strip a code fence wrapping the whole response (only the fence lines)."""
+    return _CODE_FENCE_RE.sub('', text.strip()).strip()
+
+
+def _digest_cache_path(prompt, prompt_version):
+    """Cache file for the digest generated from this prompt, prompt version and client."""
+    key = '\0'.join((CLIENT_CACHE_ID, str(prompt_version), prompt))
+    return DIGEST_CACHE_DIR / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.md"
+
+
+def _format_article(i, article):
+    """Render one article as a numbered entry for the prompt."""
+    pub_str = article.get('published', 'Unbekanntes Datum')
+    if pub_str and 'T' in pub_str:
+        pub_str = pub_str[:10]  # Just date part (ISO: YYYY-MM-DDTHH:MM:SS)
+
+    return (
+        f"[{i}] {article['title']}\n"
+        f"Quelle: {article['source']} | {pub_str}\n"
+        f"Inhalt: {article['content'][:500]}...\n"
+        f"Link: {article['link']}\n"
+    )
+
+
+async def filter_with_claude(articles, prompt_version="v1", raw_path=None, use_cache=True):
+    """
+    Filter articles using Claude Agent SDK.
+    Uses same auth as `claude` CLI binary.
+    If raw_path is given, the raw response is written there as it streams in.
+    With use_cache, a digest cached for the identical prompt, prompt version and
+    client settings is returned as is.
+    """
+    print(f"\n{'='*80}")
+    print(f"STAGE 4: FILTERING WITH CLAUDE")
+    print(f"{'='*80}\n")
+    print(f"Prompt version: {prompt_version}")
+    print(f"Articles to filter: {len(articles)}\n")
+
+    # Prepare articles for Claude
+    print(f"⏳ Bereite Artikel für Claude vor...")
+    articles_input = "\n".join(
+        _format_article(i, article) for i, article in enumerate(articles, 1)
+    )
+
+    prompt = PROMPT_TEMPLATE.format(articles_input=articles_input)
+
+    cache_path = _digest_cache_path(prompt, prompt_version)
+    if use_cache and cache_path.exists():
+        print(f"♻️  Digest für identischen Prompt im Cache: {cache_path}")
+        print(f"   (--no-cache erzwingt einen neuen Claude-Aufruf)\n")
+        return cache_path.read_text(encoding='utf-8')
+
     # Call Claude
     try:
         import time
@@ -243,13 +301,22 @@ Antworte NUR mit Markdown wie oben beschrieben."""
 
         # Receive response
         print(f"📥 Empfange Antwort von Claude...")
-        response_text = ""
-        async for message in client.receive_response():
-            if isinstance(message, AssistantMessage):
-                for block in message.content:
-                    if isinstance(block, TextBlock):
-                        response_text += block.text
-                        print(".", end="", flush=True)
+        response_parts = []
+        last_dot = time.monotonic()
+        with open(raw_path or os.devnull, 'w', encoding='utf-8') as raw_file:
+            async for message in client.receive_response():
+                if isinstance(message, AssistantMessage):
+                    for block in message.content:
+                        if isinstance(block, TextBlock):
+                            response_parts.append(block.text)
+                            # On disk right away - survives a crash mid-stream
+                            raw_file.write(block.text)
+                            raw_file.flush()
+                            now = time.monotonic()
+                            if now - last_dot >= PROGRESS_DOT_INTERVAL:
+                                print(".", end="", flush=True)
+                                last_dot = now
+        response_text = "".join(response_parts)
 
         query_time = time.time() - query_start
         print(f"\n✅ Antwort empfangen in {query_time:.1f}s")
@@ -257,25 +324,21 @@ Antworte NUR mit Markdown wie oben beschrieben."""
         print(f"🔌 Trenne Verbindung...")
         await client.disconnect()
 
-        # Clean up markdown response
-        digest_text = response_text.strip()
-        if digest_text.startswith('```markdown'):
-            digest_text = digest_text[11:]
-        if digest_text.startswith('```'):
-            digest_text = digest_text[3:]
-        if digest_text.endswith('```'):
-            digest_text = digest_text[:-3]
-
-        digest_text = digest_text.strip()
+        # Clean up markdown response (strip a wrapping code fence, if any)
+        digest_text = strip_code_fence(response_text)
 
         # Remove blank lines between bullet points in NICE-TO-KNOW section
         # This makes bullet lists more compact
-        import re
         # Pattern: Find lines that are "- [text]" followed by blank line(s) followed by another "- [text]"
         # Replace with just the two bullet lines (no blank line between)
-        digest_text = re.sub(r'(^- .+)(\n\n+)(^- )', r'\1\n\3', digest_text, flags=re.MULTILINE)
+        digest_text = _BULLET_SQUASH_RE.sub(r'\1\n\3', digest_text)
 
         print(f"\n✅ Digest erstellt ({len(digest_text)} Zeichen)\n")
+
+        if digest_text:
+            DIGEST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(digest_text, encoding='utf-8')
+
         return digest_text
 
     except Exception as e:
@@ -285,14 +348,14 @@ Antworte NUR mit Markdown wie oben beschrieben."""
         return None
 
 
-def save_digest_output(digest_text, input_file, prompt_version="v1"):
-    """Save digest as markdown file."""
+def digest_filename(prompt_version="v1"):
+    """Path of the markdown digest for this run."""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    input_name = Path(input_file).stem
+    return f"data/filtered/digest_{timestamp}_v{prompt_version}.md"
 
-    # Save as markdown
-    md_filename = f"data/filtered/digest_{timestamp}_v{prompt_version}.md"
 
+def save_digest_output(digest_text, input_file, md_filename):
+    """Save digest as markdown file."""
     with open(md_filename, 'w', encoding='utf-8') as f:
         f.write(f"# Daily News Digest\n\n")
         f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
@@ -318,18 +381,21 @@ def print_digest(digest_text):
 
 async def main():
     """Main execution."""
+    args = [arg for arg in sys.argv[1:] if arg != '--no-cache']
+    use_cache = len(args) == len(sys.argv) - 1
+
     # Get input file
-    if len(sys.argv) < 2:
+    if not args:
         # Find latest embedded dump
-        dumps = sorted(Path('data/embedded').glob('*.json'))
-        if not dumps:
+        latest = max(Path('data/embedded').glob('*.json'), default=None, key=lambda p: p.name)
+        if latest is None:
             print("❌ Keine embedded dumps in data/embedded/ gefunden")
             print("   Führe zuerst stage3_embed_filter.py aus")
             return
-        input_file = str(dumps[-1])
+        input_file = str(latest)
         print(f"Nutze neuesten embedded dump: {input_file}")
     else:
-        input_file = sys.argv[1]
+        input_file = args[0]
 
     # Load articles
     print(f"\nLade Artikel aus: {input_file}")
@@ -343,15 +409,23 @@ async def main():
     print(f"Geladen: {len(articles)} Artikel von {date_start} bis {date_end}\n")
 
     # Create digest with Claude
-    prompt_version = sys.argv[2] if len(sys.argv) > 2 else "1"
-    digest = await filter_with_claude(articles, prompt_version)
+    prompt_version = args[1] if len(args) > 1 else "1"
+    md_filename = digest_filename(prompt_version)
+    # Raw stream goes to the git-ignored cache dir, so a crashed run never
+    # leaves it in data/filtered/ for the workflow to commit
+    DIGEST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    raw_path = DIGEST_CACHE_DIR / f"{Path(md_filename).name}.partial"
+    digest = await filter_with_claude(articles, prompt_version, raw_path, use_cache)
 
     if not digest:
         print("❌ Kein Digest erstellt. Abbruch.")
+        if raw_path.exists():
+            print(f"   Rohantwort: {raw_path}")
         return
 
     # Save output
-    output_file = save_digest_output(digest, input_file, prompt_version)
+    output_file = save_digest_output(digest, input_file, md_filename)
+    raw_path.unlink(missing_ok=True)
     print(f"💾 Digest gespeichert: {output_file}\n")
 
     # Print digest
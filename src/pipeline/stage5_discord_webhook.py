@@ -19,23 +19,102 @@ Environment Variables:
 """
 
 import os
+import random
+import re
 import sys
+import time
 import requests
 from pathlib import Path
 from datetime import datetime
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 DISCORD_MESSAGE_LIMIT = 2000
 DISCORD_API_BASE = "https://discord.com/api/v10"
 
+# One keep-alive session for all Discord API calls (message, thread, chunks),
+# so the whole run shares a single TCP+TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    # Only retry failed connects: a POST that reached Discord may already have
+    # created the message, so read errors and 5xx are not retried (no duplicates).
+    # 429 is handled in post_message().
+    max_retries=Retry(
+        total=3,
+        connect=3,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=0.5,
+    ),
+))
+
+REQUEST_TIMEOUT = 15  # seconds, so a stalled connection can't hang the Action
+
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Zero-width space line for visual separation between thread messages
+SPACER_PREFIX = '\u200b\n'
+SPACED_SECTIONS = frozenset({'MUST-KNOW', 'INTERESSANT'})
+
+SECTION_HEADERS = ['# MUST-KNOW', '# INTERESSANT', '# NICE-TO-KNOW', '# DISCARDED']
+_SECTION_RE = re.compile('|'.join(re.escape(h) for h in SECTION_HEADERS))
+
+# Sections whose name is tracked per chunk (in match priority order)
+TRACKED_SECTIONS = ('MUST-KNOW', 'INTERESSANT', 'NICE-TO-KNOW')
+_SECTION_TOKENS = {f'# {name}': name for name in TRACKED_SECTIONS}
+
+_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+_H1_AFTER_NL = re.compile(r'(?<!\n)(\n)(#)( )(?!#)')
+_H1_AT_START = re.compile(r'^(#)( )(?!#)')
+_H1_INLINE = re.compile(r'([^\n#])(#)( )(?!#)')
+
 
 def load_digest(digest_path: Path) -> str:
-    """Load digest content from markdown file"""
+    """
+    Load digest content from markdown file.
+    Stops after the DISCARDED header - that section is never posted, so the
+    rest of the file doesn't need to be read, formatted or split.
+    """
+    lines = []
+    seen_must_know = False
     with open(digest_path, 'r', encoding='utf-8') as f:
-        return f.read()
+        for line in f:
+            lines.append(line)
+            if not _SECTION_RE.search(line):
+                continue
+            # Split glued headers the same way split_content_by_sections does,
+            # so only a DISCARDED header after MUST-KNOW ends the read
+            for piece in _split_glued_headers(line):
+                stripped = piece.strip()
+                if stripped.startswith('# MUST-KNOW'):
+                    seen_must_know = True
+                elif seen_must_know and stripped.startswith('# DISCARDED'):
+                    # Keep the header line itself so splitting sees the same boundary
+                    return ''.join(lines)
+    return ''.join(lines)
+
+
+def _split_glued_headers(line: str) -> list[str]:
+    """
+    Split a line at section headers that don't start it.
+    Text before a header becomes its own line (if non-empty); the header
+    line is checked again, so several glued headers are all split off.
+    """
+    lines = []
+    while True:
+        for section_name in SECTION_HEADERS:
+            if section_name in line and not line.strip().startswith(section_name):
+                before, after = line.split(section_name, 1)
+                if before.strip():  # Only keep previous content if non-empty
+                    lines.append(before.rstrip())
+                line = section_name + after
+                break
+        else:
+            lines.append(line)
+            return lines
 
 
 def split_content_by_sections(content: str) -> list[tuple[str, str]]:
@@ -45,37 +124,42 @@ def split_content_by_sections(content: str) -> list[tuple[str, str]]:
     Returns list of tuples: (chunk_text, section_name)
     """
     chunks = []
-    lines = content.split('\n')
 
-    # Fix LLM output bug: ensure section headers are on their own lines
-    for i, line in enumerate(lines):
-        for section_name in ['# MUST-KNOW', '# INTERESSANT', '# NICE-TO-KNOW', '# DISCARDED']:
-            if section_name in line and not line.strip().startswith(section_name):
-                # Split the line at the section header
-                before, after = line.split(section_name, 1)
-                # Replace with two lines (before gets discarded, section header starts fresh)
-                lines[i] = section_name + after
-                if before.strip():  # Only insert previous content if non-empty
-                    lines.insert(i, before.rstrip())
-                break
+    # Fix LLM output bug: ensure section headers are on their own lines.
+    # One finditer over the raw content finds the few lines holding a header.
+    header_lines = set()
+    line_no, pos = 0, 0
+    for match in _SECTION_RE.finditer(content):
+        line_no += content.count('\n', pos, match.start())
+        pos = match.start()
+        header_lines.add(line_no)
+
+    # Only header lines can start MUST-KNOW or DISCARDED, so their
+    # positions are recorded here instead of rescanning every line
+    lines = []
+    must_know_idx = None
+    discarded_idxs = []
+    for i, line in enumerate(content.split('\n')):
+        if i not in header_lines:
+            lines.append(line)
+            continue
+        for piece in _split_glued_headers(line):
+            stripped = piece.strip()
+            if must_know_idx is None and stripped.startswith('# MUST-KNOW'):
+                must_know_idx = len(lines)
+            elif stripped.startswith('# DISCARDED'):
+                discarded_idxs.append(len(lines))
+            lines.append(piece)
 
     current_chunk = []
     current_length = 0
     current_section = None
 
     # Skip until MUST-KNOW section
-    start_idx = 0
-    for i, line in enumerate(lines):
-        if line.strip().startswith('# MUST-KNOW'):
-            start_idx = i
-            break
+    start_idx = must_know_idx or 0
 
     # Stop at DISCARDED section (don't post discarded articles)
-    end_idx = len(lines)
-    for i, line in enumerate(lines[start_idx:], start=start_idx):
-        if line.strip().startswith('# DISCARDED'):
-            end_idx = i
-            break
+    end_idx = next((i for i in discarded_idxs if i >= start_idx), len(lines))
 
     main_content = lines[start_idx:end_idx]
 
@@ -85,17 +169,11 @@ def split_content_by_sections(content: str) -> list[tuple[str, str]]:
         is_section = line.startswith('# ') and not line.startswith('## ')
 
         # Track current section BEFORE splitting
+        # (exact header lookup first, substring match for decorated headers)
+        next_section = current_section
         if is_section:
-            if 'MUST-KNOW' in line:
-                next_section = 'MUST-KNOW'
-            elif 'INTERESSANT' in line:
-                next_section = 'INTERESSANT'
-            elif 'NICE-TO-KNOW' in line:
-                next_section = 'NICE-TO-KNOW'
-            else:
-                next_section = current_section
-        else:
-            next_section = current_section
+            next_section = _SECTION_TOKENS.get(line.rstrip()) or next(
+                (name for name in TRACKED_SECTIONS if name in line), current_section)
 
         # Split before section headers if current chunk is not empty
         if is_section and current_chunk:
@@ -109,13 +187,11 @@ def split_content_by_sections(content: str) -> list[tuple[str, str]]:
         current_section = next_section
 
         # Calculate what the chunk size would be with this line added
-        if current_chunk:
-            test_chunk = '\n'.join(current_chunk + [line])
-        else:
-            test_chunk = line
+        # (+1 for the joining newline) - no need to rebuild the chunk string
+        candidate_length = current_length + (1 if current_chunk else 0) + len(line)
 
         # If adding this line would exceed limit, save current chunk first
-        if len(test_chunk) > DISCORD_MESSAGE_LIMIT:
+        if candidate_length > DISCORD_MESSAGE_LIMIT:
             if current_chunk:
                 chunks.append(('\n'.join(current_chunk), current_section))
                 current_chunk = []
@@ -140,7 +216,13 @@ def split_content_by_sections(content: str) -> list[tuple[str, str]]:
         else:
             current_chunk.append(line)
 
-        current_length = len('\n'.join(current_chunk)) if current_chunk else 0
+        if len(line) > DISCORD_MESSAGE_LIMIT:
+            # Rare: the line was split into word-wrapped pieces
+            current_length = len('\n'.join(current_chunk))
+        elif candidate_length > DISCORD_MESSAGE_LIMIT:
+            current_length = len(line)  # line started a new chunk
+        else:
+            current_length = candidate_length
 
     # Add remaining chunk
     if current_chunk:
@@ -153,10 +235,8 @@ def split_content_by_sections(content: str) -> list[tuple[str, str]]:
 
 def format_for_discord(content: str) -> str:
     """Format markdown for Discord"""
-    import re
-
     # Disable link previews by wrapping URLs in <>
-    content = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'[\1](<\2>)', content)
+    content = _LINK_RE.sub(r'[\1](<\2>)', content)
 
     # Remove horizontal rules
     content = content.replace('---', '')
@@ -164,16 +244,16 @@ def format_for_discord(content: str) -> str:
     # Ensure double newline before h1 headers (# but not ##)
     # This fixes the formatting issue where text runs directly into headers
     # Step 1: After single newline (but not double newline)
-    content = re.sub(r'(?<!\n)(\n)(#)( )(?!#)', r'\1\n\2\3', content)
+    content = _H1_AFTER_NL.sub(r'\1\n\2\3', content)
     # Step 2: At start of string
-    content = re.sub(r'^(#)( )(?!#)', r'\n\n\1\2', content)
+    content = _H1_AT_START.sub(r'\n\n\1\2', content)
     # Step 3: After non-newline, non-hash character (text runs into header)
-    content = re.sub(r'([^\n#])(#)( )(?!#)', r'\1\n\n\2\3', content)
+    content = _H1_INLINE.sub(r'\1\n\n\2\3', content)
 
     return content
 
 
-def post_initial_message(bot_token: str, channel_id: str) -> str:
+def post_initial_message(channel_id: str) -> str:
     """
     Post the initial message in the main channel.
     Returns the message ID for thread creation.
@@ -181,23 +261,18 @@ def post_initial_message(bot_token: str, channel_id: str) -> str:
     date = datetime.now().strftime('%Y-%m-%d')
     message = f"📰 **News Digest** {date}"
 
-    headers = {
-        "Authorization": f"Bot {bot_token}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
         "content": message
     }
 
     url = f"{DISCORD_API_BASE}/channels/{channel_id}/messages"
-    response = requests.post(url, json=payload, headers=headers)
+    response = _SESSION.post(url, json=payload, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
 
     return response.json()['id']
 
 
-def create_thread(bot_token: str, channel_id: str, message_id: str) -> str:
+def create_thread(channel_id: str, message_id: str) -> str:
     """
     Create a thread under the initial message.
     Returns the thread ID.
@@ -205,37 +280,50 @@ def create_thread(bot_token: str, channel_id: str, message_id: str) -> str:
     date = datetime.now().strftime('%d.%m.%Y')
     thread_name = f"News {date}"
 
-    headers = {
-        "Authorization": f"Bot {bot_token}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
         "name": thread_name,
         "auto_archive_duration": 1440  # Archive after 24 hours
     }
 
     url = f"{DISCORD_API_BASE}/channels/{channel_id}/messages/{message_id}/threads"
-    response = requests.post(url, json=payload, headers=headers)
+    response = _SESSION.post(url, json=payload, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
 
     return response.json()['id']
 
 
-def post_to_thread(bot_token: str, thread_id: str, chunks: list[tuple[str, str]]):
+def post_message(url: str, payload: dict) -> requests.Response:
+    """
+    POST a message, retrying on 429 after Discord's retry_after (plus jitter).
+    Returns the last response; raise_for_status() is left to the caller.
+    """
+    for attempt in range(MAX_RATE_LIMIT_RETRIES):
+        response = _SESSION.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 429:
+            return response
+
+        try:
+            retry_after = float(response.json().get('retry_after'))
+        except (ValueError, TypeError, AttributeError):
+            retry_after = float(response.headers.get('Retry-After', 0) or 0)
+        delay = max(retry_after, min(0.5 * 2 ** attempt, 30)) + random.uniform(0, 0.25)
+        print(f"   ⏳ Rate limited, retrying in {delay:.1f}s...")
+        time.sleep(delay)
+
+    return response
+
+
+def post_to_thread(thread_id: str, chunks: list[tuple[str, str]]):
     """Post content chunks to Discord thread"""
     print(f"\n📤 Posting {len(chunks)} messages to thread...")
 
-    headers = {
-        "Authorization": f"Bot {bot_token}",
-        "Content-Type": "application/json"
-    }
+    url = f"{DISCORD_API_BASE}/channels/{thread_id}/messages"
 
     for i, (chunk, section) in enumerate(chunks, 1):
         # Add zero-width space on blank line for visual separation
         # Only for MUST-KNOW and INTERESSANT sections, NOT for NICE-TO-KNOW
-        if i > 1 and section in ['MUST-KNOW', 'INTERESSANT']:
-            message = '\u200b\n' + chunk.rstrip()
+        if i > 1 and section in SPACED_SECTIONS:
+            message = SPACER_PREFIX + chunk.rstrip()
         else:
             message = chunk.rstrip()
 
@@ -243,17 +331,20 @@ def post_to_thread(bot_token: str, thread_id: str, chunks: list[tuple[str, str]]
             "content": message
         }
 
-        url = f"{DISCORD_API_BASE}/channels/{thread_id}/messages"
-
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = post_message(url, payload)
             response.raise_for_status()
             print(f"   ✅ Posted chunk {i}/{len(chunks)}")
 
-            # Rate limiting: Discord allows ~5 messages per 5 seconds
-            if i < len(chunks):
-                import time
-                time.sleep(1)
+            # Rate limiting: only wait once Discord reports the bucket as empty
+            # (malformed headers fall back to not sleeping)
+            try:
+                remaining = int(response.headers.get('X-RateLimit-Remaining', 1))
+                reset_after = max(float(response.headers.get('X-RateLimit-Reset-After', 0)), 0)
+            except (ValueError, TypeError):
+                remaining, reset_after = 1, 0
+            if remaining == 0 and i < len(chunks):
+                time.sleep(reset_after)
 
         except requests.exceptions.HTTPError as e:
             print(f"   ❌ Failed to post chunk {i}: {e}")
@@ -266,6 +357,10 @@ def main():
     print("STAGE 5: POST TO DISCORD (THREAD)")
     print("="*80 + "\n")
 
+    # Load environment variables from .env file (only needed when posting)
+    from dotenv import load_dotenv
+    load_dotenv()
+
     # Get bot credentials
     bot_token = os.getenv('DISCORD_BOT_TOKEN')
     channel_id = os.getenv('DISCORD_CHANNEL_ID')
@@ -282,11 +377,10 @@ def main():
         digest_path = Path(sys.argv[1])
     else:
         # Use latest digest
-        digest_files = sorted(Path('data/filtered').glob('digest_*.md'), reverse=True)
-        if not digest_files:
+        digest_path = max(Path('data/filtered').glob('digest_*.md'), default=None, key=lambda p: p.name)
+        if digest_path is None:
             print("❌ No digest files found")
             sys.exit(1)
-        digest_path = digest_files[0]
 
     if not digest_path.exists():
         print(f"❌ Digest file not found: {digest_path}")
@@ -306,22 +400,28 @@ def main():
     print(f"   Created {len(chunks)} chunks")
 
     # Post to Discord
+    _SESSION.headers.update({
+        "Authorization": f"Bot {bot_token}",
+        "Content-Type": "application/json"
+    })
     try:
         print(f"\n📝 Posting initial message to main channel...")
-        message_id = post_initial_message(bot_token, channel_id)
+        message_id = post_initial_message(channel_id)
         print(f"   ✅ Posted message (ID: {message_id})")
 
         print(f"\n🧵 Creating thread...")
-        thread_id = create_thread(bot_token, channel_id, message_id)
+        thread_id = create_thread(channel_id, message_id)
         print(f"   ✅ Created thread (ID: {thread_id})")
 
-        post_to_thread(bot_token, thread_id, chunks)
+        post_to_thread(thread_id, chunks)
 
     except Exception as e:
         print(f"\n❌ Failed to post to Discord: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        _SESSION.close()
 
     print("\n" + "="*80)
     print(f"✅ DIGEST POSTED TO DISCORD")
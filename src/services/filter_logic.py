@@ -5,7 +5,9 @@ Shared Filter Logic
 Domain logic for article filtering - keyword-based blacklist filtering.
 """
 
-from typing import List, Dict, Tuple, Any
+import re
+from functools import lru_cache
+from typing import List, Dict, Tuple, Any, Optional
 
 
 # Blacklist Keywords - Single Source of Truth
@@ -64,6 +66,51 @@ BLACKLIST_KEYWORDS = [
 ]
 
 
+def _trie_to_pattern(node: Dict[str, Dict]) -> str:
+    """Render a character trie as a regex; '' marks the end of a keyword."""
+    branches = [
+        re.escape(char) + _trie_to_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ''
+    if len(branches) == 1 and '' not in node:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if '' in node else pattern
+
+
+@lru_cache(maxsize=16)
+def _compile_keywords(keywords: Tuple[str, ...]) -> Tuple[Optional[re.Pattern], Tuple[Tuple[str, str], ...]]:
+    """
+    Compile keywords into a single prefix-trie regex, so each text is scanned once.
+
+    A flat 'a|b|c' alternation retries every keyword at every position and is
+    slower than looping over `in` checks; factoring shared prefixes lets the
+    regex engine reject most positions on the first character. Cached, so
+    custom keyword lists are only compiled once as well.
+
+    Returns (pattern, [(keyword, keyword_lower), ...]) with blank keywords
+    dropped; pattern is None if no keywords are left.
+    """
+    entries = tuple((keyword, keyword.lower()) for keyword in keywords if keyword.strip())
+    if not entries:
+        return None, entries
+
+    trie: Dict[str, Dict] = {}
+    for _, keyword_lower in entries:
+        node = trie
+        for char in keyword_lower:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return re.compile(_trie_to_pattern(trie)), entries
+
+
+# Compiled once at import - BLACKLIST_KEYWORDS is constant
+_BLACKLIST = _compile_keywords(tuple(BLACKLIST_KEYWORDS))
+
+
 def contains_blacklisted_keyword(text: str, keywords: List[str] = None) -> Tuple[bool, str]:
     """
     Check if text contains any blacklisted keyword.
@@ -73,15 +120,23 @@ def contains_blacklisted_keyword(text: str, keywords: List[str] = None) -> Tuple
         keywords: Optional custom keyword list (defaults to BLACKLIST_KEYWORDS)
 
     Returns:
-        (is_blacklisted, matched_keyword)
+        (is_blacklisted, matched_keyword) - the first matching keyword in list order
     """
     if keywords is None:
-        keywords = BLACKLIST_KEYWORDS
+        pattern, entries = _BLACKLIST
+    else:
+        pattern, entries = _compile_keywords(tuple(keywords))
+
+    if pattern is None:
+        return False, ""
 
     text_lower = text.lower()
-    for keyword in keywords:
-        if keyword.lower() in text_lower:
-            return True, keyword
+    # Most texts don't match, so the single regex scan decides; only hits pay
+    # for finding which keyword (in list order) to report
+    if pattern.search(text_lower):
+        for keyword, keyword_lower in entries:
+            if keyword_lower in text_lower:
+                return True, keyword
     return False, ""
 
 
@@ -0,0 +1,32 @@
+"""Tests for Stage 4 response cleanup."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('claude_agent_sdk')
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src' / 'pipeline'))
+
+from stage4_filter import strip_code_fence  # noqa: E402
+
+
+@pytest.mark.parametrize('response, expected', [
+    ('```markdown\n# MUST-KNOW\n- a\n```', '# MUST-KNOW\n- a'),
+    ('```md\n# MUST-KNOW\n```', '# MUST-KNOW'),
+    ('```\n# MUST-KNOW\n```', '# MUST-KNOW'),
+    ('  ```markdown \r\n# MUST-KNOW\n```  \n', '# MUST-KNOW'),
+    ('# MUST-KNOW\n- a', '# MUST-KNOW\n- a'),
+])
+def test_strip_code_fence(response, expected):
+    assert strip_code_fence(response) == expected
+
+
+@pytest.mark.parametrize('response, expected', [
+    # First line glued to the fence: only the backticks go, the text stays
+    ('```markdown Heute wichtig:\n# MUST-KNOW\n```', 'markdown Heute wichtig:\n# MUST-KNOW'),
+    ('```md', 'md'),
+    ('```# MUST-KNOW\n- a\n```', '# MUST-KNOW\n- a'),
+])
+def test_strip_code_fence_keeps_text_glued_to_fence(response, expected):
+    assert strip_code_fence(response) == expected